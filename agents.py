@@ -1,30 +1,275 @@
 # agents.py - Redesigned with single generic agent type
 
+import functools
+import hashlib
+import io
+import itertools
+import logging
+import os
+import queue
 import threading
 import time
-import uuid
-import requests
 import json
 import re
-from typing import Dict, Any, List, Optional, Callable
-from datetime import datetime
-from dotenv import load_dotenv
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Callable, Set, Tuple, Union
+from enum import IntEnum
+from types import MappingProxyType
 
-load_dotenv()
-from moonshot_client import MoonshotClient
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Embedding code that manages its own environment can skip reading .env
+if not os.environ.get("REDTEAM_SKIP_DOTENV"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+if TYPE_CHECKING:
+    from moonshot_client import MoonshotClient
+
+logger = logging.getLogger(__name__)
+
+class AgentStatus(IntEnum):
+    """Agent status values; finished states compare >= COMPLETED."""
+    PENDING = 0
+    RUNNING = 1
+    COMPLETED = 2
+    FAILED = 3
+    
+    # Display and format by name, as the old string constants did
+    def __str__(self) -> str:
+        return self.name
+    
+    def __format__(self, format_spec: str) -> str:
+        return format(self.name, format_spec)
+
+
+# Agent ids increase in creation order; seeding from the clock keeps them
+# unique across restarts (they end up in result file names)
+_AGENT_ID_GEN = itertools.count(int(time.time() * 1000))
+
+# Single-pass matcher for the <tool><name>...</name><parameters>...</parameters></tool>
+# call format shared by the MCP tools (curl uses the short <n> tag)
+_TOOL_XML_RE = re.compile(
+    r'<tool>\s*<(n|name)>\s*([\w ]+?)\s*</\1>\s*<parameters>.*?</parameters>\s*</tool>',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+# Phrases that signal an agent considers its task done
+COMPLETION_INDICATORS = (
+    "task completed", "analysis complete", "report complete",
+    "findings summary", "conclusion", "final results",
+    "task finished", "no further action needed", "complete"
+)
+
+# All indicators in one case-insensitive pass, without lowercasing the response
+_COMPLETION_RE = re.compile("|".join(map(re.escape, COMPLETION_INDICATORS)), re.IGNORECASE)
+
+
+# If the history is still larger than this after compaction, the oldest tool
+# results are replaced by a one-line placeholder until it fits
+MAX_PROMPT_CHARS = config.AGENT_HISTORY_MAX_CHARS
+
+# Once an agent's history grows past this many characters, older tool results
+# are cut down to their first and last TOOL_RESULT_EXCERPT characters. Derived
+# from the budget so a smaller configured budget is still honoured.
+HISTORY_COMPACT_THRESHOLD = min(16000, MAX_PROMPT_CHARS * 2 // 3)
+TOOL_RESULT_EXCERPT = 500
+
+# Longer tool results are truncated before they enter the history; the full
+# text is still kept in tool_results
+MAX_TOOL_RESULT_CHARS = min(8192, MAX_PROMPT_CHARS // 2)
+
+# Mark messages that have already been compacted or evicted
+_COMPACTED_PREFIX = "[Earlier tool result, "
+_EVICTED_PREFIX = "[Earlier tool result evicted, "
+
+# Most recent messages (two user/assistant turns) that are never compacted
+RECENT_MESSAGES_KEPT = 4
+
+# Cap on the per-agent tools_used / tool_results logs
+MAX_TRACKED_TOOL_CALLS = 50
+
+# Messages fed back to the agent. The fixed wording comes first and only the
+# trailing details vary, so repeated messages share as long a prefix as possible.
+_TOOL_RESULT_MESSAGE = "Tool '{tool}' executed successfully.\n\nResults:\n{result}"
+_TOOL_ERROR_MESSAGE = "A tool encountered an error. Please continue with available information.\nTool: {tool}\nError: {error}"
+_ITERATION_ERROR_MESSAGE = "An error occurred. Please continue with available information.\nError in iteration {iteration}: {error}"
+
+# Closing tag of a tool call; the reply is cut off once this has streamed in
+_TOOL_CALL_END = "</tool>"
+
+
+def _cheap_len(value: Any) -> int:
+    """Length of a str/bytes value for logging, or -1 instead of stringifying it."""
+    return len(value) if isinstance(value, (str, bytes)) else -1
+
+
+def _normalize_tool_tag(tag: str) -> str:
+    """Normalize an XML tool name so 'Web Search' and 'web_search' match."""
+    return tag.strip().lower().replace(' ', '_')
+
+
+def _tools_signature(tools: List[Tuple[str, Any]]) -> Tuple[Tuple[str, str, str], ...]:
+    """
+    Return a hashable (display_name, description, usage) key for (tool_name, tool) pairs.
+    
+    The key holds only the text that goes into the prompt, never the tool
+    objects, so the prompt caches don't keep replaced tool instances alive and
+    a tool whose description changes is re-rendered automatically.
+    """
+    # Ordered by tool name, as the tools section always has been
+    return tuple(
+        (
+            getattr(tool, 'friendly_name', tool_name),
+            getattr(tool, 'description', 'No description'),
+            getattr(tool, 'get_system_prompt', lambda: '')(),
+        )
+        for tool_name, tool in sorted(tools, key=lambda item: item[0])
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _render_tool_block(display_name: str, description: str, system_prompt: str) -> str:
+    """Render one tool's entry in the AVAILABLE TOOLS section."""
+    buf = io.StringIO()
+    buf.write(f"=== {display_name} ===\nDescription: {description}\n")
+    if system_prompt:
+        buf.write(f"Usage Instructions:\n{system_prompt}\n")
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=32)
+def _render_tools_block(tools_signature: Tuple[Tuple[str, str, str], ...]) -> str:
+    """
+    Render the AVAILABLE TOOLS section for a tool signature.
+    
+    Each tool's block is cached on its own, so a new combination of enabled
+    tools only joins strings that were already rendered.
+    """
+    if not tools_signature:
+        return "No tools available"
+    return "\n".join(_render_tool_block(*entry) for entry in tools_signature)
+
+
+@functools.lru_cache(maxsize=32)
+def _build_static_system_prompt(tools_text: str) -> str:
+    """
+    Build the generic system prompt around a rendered tools section.
+    
+    Nothing agent-specific goes in here, so every agent sharing a tool set sends
+    a byte-identical prefix and the backend can reuse its prompt cache.
+    """
+    return f"""You are a versatile AI agent capable of handling any task.
+
+AVAILABLE TOOLS:
+{tools_text}
+
+EXECUTION GUIDELINES:
+1. Analyze the task instructions provided by the orchestrator
+2. Break down complex tasks into manageable steps
+3. Use available tools systematically to gather information or perform actions
+4. Be thorough and methodical in your approach
+5. Provide clear updates on your progress
+6. Deliver comprehensive results
+
+TOOL USAGE RULES:
+- Use tools by including their exact XML format in your responses
+- Wait for tool results before proceeding to next steps
+- Use multiple tools if needed to complete the task thoroughly
+- Analyze all tool results and incorporate findings into your work
+
+RESPONSE FORMAT:
+- Explain your approach to the task
+- Use tools with proper XML syntax when needed
+- Analyze and synthesize information from multiple sources
+- Provide clear, actionable results
+- Summarize key findings and conclusions
+
+You will receive specific task instructions from the orchestrator. Execute them systematically using the available tools and your analytical capabilities."""
+
+
+# Callback registration replaces the callback tuple instead of appending to it, so
+# notifying threads iterate a consistent snapshot without taking this lock
+_CALLBACKS_LOCK = threading.Lock()
+
+
+# MoonshotClient holds no per-conversation state, so agents on the same model share one
+_CLIENT_CACHE: Dict[str, "MoonshotClient"] = {}
+_CLIENT_LOCK = threading.Lock()
+
+
+def _get_client(model: str) -> "MoonshotClient":
+    """Return the shared client for a model, creating it on first use."""
+    client = _CLIENT_CACHE.get(model)
+    if client is None:
+        # Deferred so importing this module doesn't pull in the HTTP stack
+        from moonshot_client import MoonshotClient
+        with _CLIENT_LOCK:
+            client = _CLIENT_CACHE.get(model)
+            if client is None:
+                client = _CLIENT_CACHE[model] = MoonshotClient(model=model)
+    return client
+
+
+class ResponseCache:
+    """Thread-safe exact-match cache of LLM responses keyed by model and payload."""
+    
+    def __init__(self, maxsize: int = 512, ttl: float = 900):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(model: str, payload: Dict[str, Any]) -> str:
+        """Hash a request into a stable cache key."""
+        request = {"m": model, "p": payload}
+        if orjson is not None:
+            data = orjson.dumps(request, option=orjson.OPT_SORT_KEYS)
+        else:
+            data = json.dumps(request, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, response = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+    
+    def set(self, key: str, response: str):
+        """Store a response, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = (time.time(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
 
-class AgentStatus:
-    """Agent status constants."""
-    PENDING = "PENDING"
-    RUNNING = "RUNNING" 
-    COMPLETED = "COMPLETED"
-    FAILED = "FAILED"
 
 class BaseAgent:
     """Base class for all agents."""
     
+    __slots__ = (
+        'id', 'name', 'description', 'status', 'result', 'error',
+        'start_time', 'end_time', 'callbacks', 'conversation_history',
+        '_finished', '_transition_hooks', '_status_lock',
+    )
+    
     def __init__(self, name: str, description: str = ""):
-        self.id = uuid.uuid4().int & 0xFFFFFFFF
+        self.id = next(_AGENT_ID_GEN)
         self.name = name
         self.description = description
         self.status = AgentStatus.PENDING
@@ -32,17 +277,32 @@ class BaseAgent:
         self.error = None
         self.start_time = None
         self.end_time = None
-        self.callbacks: List[Callable] = []
+        self.callbacks: Tuple[Callable, ...] = ()
+        
+        # Called as hook(agent, old_status, new_status) before the callbacks run
+        self._transition_hooks: Tuple[Callable, ...] = ()
         
         # Each agent has independent conversation history
         self.conversation_history: List[Dict[str, str]] = []
+        
+        # Set once the agent reaches a final status so waiters don't have to poll
+        self._finished = threading.Event()
+        
+        # Serializes status changes so transition hooks see each change once
+        self._status_lock = threading.Lock()
     
     def __str__(self):
         return f"Agent {self.id}: {self.name} [{self.status}]"
     
     def add_callback(self, callback: Callable):
         """Add callback for status updates."""
-        self.callbacks.append(callback)
+        with _CALLBACKS_LOCK:
+            self.callbacks = self.callbacks + (callback,)
+    
+    def add_transition_hook(self, hook: Callable):
+        """Add hook called with (agent, old_status, new_status) on every status change."""
+        with _CALLBACKS_LOCK:
+            self._transition_hooks = self._transition_hooks + (hook,)
     
     def _notify_callbacks(self):
         """Notify all callbacks of status change."""
@@ -50,16 +310,42 @@ class BaseAgent:
             try:
                 callback(self)
             except Exception as e:
-                print(f"Error in callback: {e}")
-    
-    def set_status(self, status: str):
-        """Set agent status and notify callbacks."""
-        self.status = status
-        if status == AgentStatus.RUNNING:
-            self.start_time = time.time()
-        elif status in [AgentStatus.COMPLETED, AgentStatus.FAILED]:
-            self.end_time = time.time()
+                logger.error("Error in callback: %s", e)
+    
+    def set_status(self, status: AgentStatus, expected: Optional[AgentStatus] = None,
+                   error: Optional[str] = None) -> bool:
+        """
+        Set agent status and notify callbacks.
+        
+        With ``expected``, the status only changes if it currently equals it, so
+        a stop and a normal completion can't both apply. ``error`` is recorded
+        together with the change. Returns whether the status was changed.
+        """
+        with self._status_lock:
+            old_status = self.status
+            if expected is not None and old_status != expected:
+                return False
+            if error is not None:
+                self.error = error
+            self.status = status
+            if status == AgentStatus.RUNNING:
+                self.start_time = time.time()
+            elif status >= AgentStatus.COMPLETED:
+                self.end_time = time.time()
+            # Hooks run under the lock so they see transitions in order
+            for hook in self._transition_hooks:
+                try:
+                    hook(self, old_status, status)
+                except Exception as e:
+                    logger.error("Error in transition hook: %s", e)
         self._notify_callbacks()
+        if status >= AgentStatus.COMPLETED:
+            self._finished.set()
+        return True
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the agent completes or fails. Returns False on timeout."""
+        return self._finished.wait(timeout)
     
     def get_execution_time(self) -> Optional[float]:
         """Get execution time in seconds."""
@@ -67,20 +353,21 @@ class BaseAgent:
             return self.end_time - self.start_time
         return None
     
-    def execute(self) -> threading.Thread:
-        """Execute agent in separate thread."""
+    def execute(self, executor: Optional[Executor] = None) -> Union[Future, threading.Thread]:
+        """Execute agent on the given executor, or in a separate thread if none is given."""
         def _execute():
             try:
                 self.set_status(AgentStatus.RUNNING)
                 result = self._execute_task()
                 self.result = result
-                self.set_status(AgentStatus.COMPLETED)
+                # Don't overwrite a stop requested while the task was running
+                self.set_status(AgentStatus.COMPLETED, expected=AgentStatus.RUNNING)
             except Exception as e:
-                self.error = str(e)
-                self.set_status(AgentStatus.FAILED)
-                print(f"Agent {self.name} failed: {e}")
-                import traceback
-                traceback.print_exc()
+                self.set_status(AgentStatus.FAILED, expected=AgentStatus.RUNNING, error=str(e))
+                logger.exception("Agent %s failed: %s", self.name, e)
+        
+        if executor is not None:
+            return executor.submit(_execute)
         
         thread = threading.Thread(target=_execute, daemon=True)
         thread.start()
@@ -94,6 +381,12 @@ class BaseAgent:
 class GenericAgent(BaseAgent):
     """Single generic agent that can handle any task based on orchestrator instructions."""
     
+    __slots__ = (
+        'instructions', 'tools', 'model', 'client', 'response_cache',
+        'tools_used', 'tool_results', '_active_tools', '_tool_display_names',
+        '_tool_names_by_tag', '_pinned_messages',
+    )
+    
     def __init__(
         self,
         name: str,
@@ -101,88 +394,80 @@ class GenericAgent(BaseAgent):
         instructions: str,
         tools: Dict[str, Any],
         model: str = "moonshot-v1-32k",
+        response_cache: Optional[ResponseCache] = None,
         **kwargs
     ):
         super().__init__(name=name, description=description)
         
         # Store the specific instructions from orchestrator
         self.instructions = instructions
-        self.tools = {k: v for k, v in tools.items() if k != 'mcp_agent_creator'}
+        # Agents can't spawn agents. Callers normally pass an already filtered
+        # dict, which is then wrapped read-only instead of being copied.
+        if 'mcp_agent_creator' in tools:
+            tools = {k: v for k, v in tools.items() if k != 'mcp_agent_creator'}
+        self.tools = MappingProxyType(tools)
         self.model = model
         
+        # Enabled tools and their lookups, resolved once rather than per response
+        self._active_tools: List[Tuple[str, Any]] = []
+        self._tool_display_names: Dict[str, str] = {}
+        self._tool_names_by_tag: Dict[str, str] = {}
+        self.refresh_active_tools()
+        
         # Initialize Moonshot client
-        self.client = MoonshotClient(model=model)
+        self.client = _get_client(model)
+        self.response_cache = response_cache
         
         # Track tool usage
-        self.tools_used = []
-        self.tool_results = []
+        self.tools_used = deque(maxlen=MAX_TRACKED_TOOL_CALLS)
+        self.tool_results = deque(maxlen=MAX_TRACKED_TOOL_CALLS)
         
         # Initialize conversation with orchestrator's instructions
         self._initialize_conversation()
 
+    def refresh_active_tools(self):
+        """Re-read which tools are enabled, e.g. after tools were toggled."""
+        self._active_tools = [
+            (tool_name, tool) for tool_name, tool in self.tools.items()
+            if getattr(tool, 'enabled', True)
+        ]
+        self._tool_display_names = {
+            tool_name: getattr(tool, 'friendly_name', tool_name)
+            for tool_name, tool in self._active_tools
+        }
+        # Map XML tool names to tool keys for single-pass dispatch
+        self._tool_names_by_tag = {
+            _normalize_tool_tag(getattr(tool, 'xml_name', tool_name)): tool_name
+            for tool_name, tool in self._active_tools
+        }
+
     def _initialize_conversation(self):
-        """Initialize agent with generic system prompt and specific instructions."""
-        system_prompt = self._build_generic_system_prompt()
-        
+        """Initialize agent with the shared system prompt and specific instructions."""
         self.conversation_history = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": self._build_generic_system_prompt()},
+            {"role": "system", "content": self._build_agent_details_prompt()},
             {"role": "user", "content": self.instructions}
         ]
+        # System prompts and instructions are never compacted
+        self._pinned_messages = len(self.conversation_history)
     
     def _build_generic_system_prompt(self) -> str:
-        """Build completely generic system prompt."""
-        # Build tools description
-        tools_descriptions = []
-        for tool_name, tool in self.tools.items():
-            if getattr(tool, 'enabled', True):
-                display_name = getattr(tool, 'friendly_name', tool_name)
-                description = getattr(tool, 'description', 'No description')
-                system_prompt = getattr(tool, 'get_system_prompt', lambda: '')()
-                
-                tools_descriptions.append(f"=== {display_name} ===")
-                tools_descriptions.append(f"Description: {description}")
-                if system_prompt:
-                    tools_descriptions.append(f"Usage Instructions:\n{system_prompt}")
-                tools_descriptions.append("")
-        
-        tools_text = "\n".join(tools_descriptions) if tools_descriptions else "No tools available"
-        
-        return f"""You are {self.name}, a versatile AI agent capable of handling any task.
+        """Build the static, agent-independent system prompt for the enabled tools."""
+        tools_text = _render_tools_block(_tools_signature(self._active_tools))
+        return _build_static_system_prompt(tools_text)
+    
+    def _build_agent_details_prompt(self) -> str:
+        """Build the per-agent part of the system prompt."""
+        return f"""You are {self.name}.
 
 AGENT DETAILS:
 - Name: {self.name}
 - Description: {self.description}
-- Mission: Complete the specific task assigned by the orchestrator
-
-AVAILABLE TOOLS:
-{tools_text}
-
-EXECUTION GUIDELINES:
-1. Analyze the task instructions provided by the orchestrator
-2. Break down complex tasks into manageable steps
-3. Use available tools systematically to gather information or perform actions
-4. Be thorough and methodical in your approach
-5. Provide clear updates on your progress
-6. Deliver comprehensive results
-
-TOOL USAGE RULES:
-- Use tools by including their exact XML format in your responses
-- Wait for tool results before proceeding to next steps
-- Use multiple tools if needed to complete the task thoroughly
-- Analyze all tool results and incorporate findings into your work
-
-RESPONSE FORMAT:
-- Explain your approach to the task
-- Use tools with proper XML syntax when needed
-- Analyze and synthesize information from multiple sources
-- Provide clear, actionable results
-- Summarize key findings and conclusions
-
-You will receive specific task instructions from the orchestrator. Execute them systematically using the available tools and your analytical capabilities."""
+- Mission: Complete the specific task assigned by the orchestrator"""
 
     def _execute_task(self) -> Dict[str, Any]:
         """Execute the agent's task with tool integration."""
-        print(f"Agent {self.name} starting execution...")
+        logger.info("Agent %s starting execution...", self.name)
         
         # Run conversation loop
         final_result = self._run_conversation_loop()
@@ -192,8 +477,8 @@ You will receive specific task instructions from the orchestrator. Execute them
             "instructions": self.instructions,
             "final_result": final_result,
             "conversation_length": len(self.conversation_history),
-            "tools_used": self.tools_used,
-            "tool_results": self.tool_results
+            "tools_used": list(self.tools_used),
+            "tool_results": list(self.tool_results)
         }
     
     def _run_conversation_loop(self) -> str:
@@ -202,16 +487,17 @@ You will receive specific task instructions from the orchestrator. Execute them
         iteration = 0
         last_response = ""
         
-        while iteration < max_iterations:
+        while iteration < max_iterations and self.status == AgentStatus.RUNNING:
             iteration += 1
-            print(f"Agent {self.name} - Iteration {iteration}")
+            logger.debug("Agent %s - Iteration %d", self.name, iteration)
             
             try:
+                self._compact_history()
                 response = self._make_api_call()
                 if not response:
                     break
                 
-                print(f"Agent {self.name} response length: {len(response)}")
+                logger.debug("Agent %s response length: %d", self.name, len(response))
                 self.conversation_history.append({"role": "assistant", "content": response})
                 last_response = response
                 
@@ -219,23 +505,16 @@ You will receive specific task instructions from the orchestrator. Execute them
                 tool_used = self._process_tool_usage(response)
                 
                 # Check for completion
-                completion_indicators = [
-                    "task completed", "analysis complete", "report complete",
-                    "findings summary", "conclusion", "final results",
-                    "task finished", "no further action needed", "complete"
-                ]
-                
-                response_lower = response.lower()
-                task_seems_complete = any(indicator in response_lower for indicator in completion_indicators)
+                task_seems_complete = _COMPLETION_RE.search(response) is not None
                 
                 if not tool_used and (task_seems_complete or iteration > 10):
-                    print(f"Agent {self.name} completed task (iteration {iteration})")
+                    logger.info("Agent %s completed task (iteration %d)", self.name, iteration)
                     break
                 
             except Exception as e:
-                error_msg = f"Error in iteration {iteration}: {str(e)}"
-                print(f"Agent {self.name} error: {error_msg}")
-                self.conversation_history.append({"role": "user", "content": f"Error occurred: {error_msg}. Please continue with available information."})
+                logger.warning("Agent %s error: Error in iteration %d: %s", self.name, iteration, e)
+                error_message = _ITERATION_ERROR_MESSAGE.format(iteration=iteration, error=e)
+                self.conversation_history.append({"role": "user", "content": error_message})
                 continue
         
         return last_response or "Task execution completed"
@@ -244,19 +523,18 @@ You will receive specific task instructions from the orchestrator. Execute them
         """Process tool usage in agent response."""
         tool_used = False
         
-        # Check each available tool
-        for tool_name, tool in self.tools.items():
+        for tool_name, tool, text in self._iter_tool_candidates(response):
+            # The tool may have been switched off in the UI since the last refresh
             if not getattr(tool, 'enabled', True):
                 continue
-            
             try:
-                command = tool.detect_request(response)
+                command = tool.detect_request(text)
                 if command:
-                    print(f"Agent {self.name} - Detected {tool_name} usage: {command}")
+                    logger.info("Agent %s - Detected %s usage: %s", self.name, tool_name, command)
                     
                     # Execute tool
                     tool_result = tool.execute(command)
-                    print(f"Agent {self.name} - Tool {tool_name} result length: {len(str(tool_result))}")
+                    logger.debug("Agent %s - Tool %s result length: %d", self.name, tool_name, _cheap_len(tool_result))
                     
                     # Track tool usage
                     self.tools_used.append({
@@ -271,55 +549,235 @@ You will receive specific task instructions from the orchestrator. Execute them
                     })
                     
                     # Add tool result to conversation
-                    display_name = getattr(tool, 'friendly_name', tool_name)
-                    tool_message = f"Tool '{display_name}' executed successfully.\n\nResults:\n{tool_result}"
+                    result_text = str(tool_result)
+                    if len(result_text) > MAX_TOOL_RESULT_CHARS:
+                        omitted = len(result_text) - MAX_TOOL_RESULT_CHARS
+                        result_text = f"{result_text[:MAX_TOOL_RESULT_CHARS]}\n...[truncated {omitted} characters]"
+                    tool_message = _TOOL_RESULT_MESSAGE.format(tool=self._tool_display_names[tool_name], result=result_text)
                     self.conversation_history.append({"role": "user", "content": tool_message})
                     
                     tool_used = True
                     break
                         
             except Exception as e:
-                print(f"Agent {self.name} - Tool {tool_name} error: {e}")
-                error_message = f"Tool '{tool_name}' encountered an error: {str(e)}\nPlease continue with available information."
+                logger.warning("Agent %s - Tool %s error: %s", self.name, tool_name, e)
+                error_message = _TOOL_ERROR_MESSAGE.format(tool=tool_name, error=e)
                 self.conversation_history.append({"role": "user", "content": error_message})
                 tool_used = True
                 break
         
         return tool_used
     
+    def _compact_history(self):
+        """
+        Shrink older tool results before the history is sent again.
+        
+        Without this every iteration resends every earlier tool result in full,
+        so the payload grows with the iteration count. The pinned prompt and the
+        latest turns are left verbatim. Once the history exceeds the threshold,
+        older user messages (tool results and error notes) keep only their head
+        and tail; if it is still over MAX_PROMPT_CHARS, the oldest of them are
+        evicted down to a placeholder.
+        """
+        total = sum(len(m["content"]) for m in self.conversation_history)
+        if total <= HISTORY_COMPACT_THRESHOLD:
+            return
+        
+        end = len(self.conversation_history) - RECENT_MESSAGES_KEPT
+        older = [m for m in self.conversation_history[self._pinned_messages:end] if m["role"] == "user"]
+        
+        limit = 2 * TOOL_RESULT_EXCERPT
+        for message in older:
+            content = message["content"]
+            if len(content) > limit and not content.startswith(_COMPACTED_PREFIX):
+                omitted = len(content) - limit
+                message["content"] = (
+                    f"{_COMPACTED_PREFIX}{omitted} characters omitted]\n"
+                    f"{content[:TOOL_RESULT_EXCERPT]}\n...\n{content[-TOOL_RESULT_EXCERPT:]}"
+                )
+                total -= len(content) - len(message["content"])
+        
+        for message in older:
+            if total <= MAX_PROMPT_CHARS:
+                break
+            content = message["content"]
+            if not content.startswith(_EVICTED_PREFIX):
+                message["content"] = f"{_EVICTED_PREFIX}{len(content)} characters]"
+                total -= len(content) - len(message["content"])
+    
+    def _iter_tool_candidates(self, response: str):
+        """
+        Yield (tool_name, tool, text) pairs to try for tool detection.
+        
+        An XML tool call is located with one regex pass and dispatched straight
+        to the named tool, which only has to parse the matched block. Every tool
+        is still offered the full response afterwards so the free-text formats
+        (e.g. "search for ...") keep working.
+        """
+        # Plain-text replies skip the regex scan entirely
+        match = _TOOL_XML_RE.search(response) if "<" in response else None
+        if match:
+            tool_name = self._tool_names_by_tag.get(_normalize_tool_tag(match.group(2)))
+            if tool_name is not None:
+                yield tool_name, self.tools[tool_name], match.group(0)
+        
+        for tool_name, tool in self._active_tools:
+            yield tool_name, tool, response
+    
     def _make_api_call(self) -> Optional[str]:
         """Call Moonshot API directly."""
         payload = {
             "messages": self.conversation_history,
-            "temperature": 0.7,
-            "max_tokens": 2000,
-            "stream": False
+            "temperature": config.DEFAULT_TEMPERATURE,
+            "max_tokens": config.AGENT_MAX_TOKENS
         }
         
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = ResponseCache.make_key(self.model, payload)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Agent %s - Using cached response for %d messages", self.name, len(self.conversation_history))
+                return cached
+        
         try:
-            print(f"Agent {self.name} - Making API call with {len(self.conversation_history)} messages")
-            response = self.client.chat(**payload)
+            logger.debug("Agent %s - Making API call with %d messages", self.name, len(self.conversation_history))
+            response = self._stream_until_tool_call(payload)
             
             if not response:
                 raise Exception("Empty response from API")
             
+            if cache_key is not None:
+                self.response_cache.set(cache_key, response)
+            
             return response
             
         except Exception as e:
             raise Exception(f"API call failed: {str(e)}")
 
 
+    def _stream_until_tool_call(self, payload: Dict[str, Any]) -> str:
+        """
+        Stream the reply and stop as soon as a complete tool call has arrived.
+        
+        Anything the model writes after </tool> is thrown away once the tool
+        result is appended, so there is no point waiting for it to be generated.
+        """
+        parts = []
+        tail = ""
+        stream = self.client.stream_chat(**payload)
+        try:
+            for delta in stream:
+                # Stopped by the orchestrator or on shutdown: abandon the reply
+                if self.status != AgentStatus.RUNNING:
+                    break
+                parts.append(delta)
+                window = tail + delta
+                if _TOOL_CALL_END in window:
+                    # Drop whatever followed </tool> in the same chunk
+                    text = "".join(parts)
+                    return text[:text.index(_TOOL_CALL_END) + len(_TOOL_CALL_END)]
+                tail = window[-len(_TOOL_CALL_END):]
+        finally:
+            stream.close()
+        
+        return "".join(parts)
+
+
+class _DaemonThreadExecutor(Executor):
+    """
+    Run each submitted call on its own daemon thread, at most max_workers at once.
+    
+    ThreadPoolExecutor workers are joined at interpreter exit, so closing the
+    app would wait for every in-flight LLM stream or tool run. Daemon threads
+    don't hold up exit; a semaphore keeps the concurrency cap. Calls still
+    waiting for a slot when shutdown() is requested are cancelled.
+    """
+    
+    def __init__(self, max_workers: int, thread_name_prefix: str = "worker"):
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._shutdown = threading.Event()
+        self._thread_name_prefix = thread_name_prefix
+        self._thread_ids = itertools.count()
+        self._threads: Set[threading.Thread] = set()
+        self._threads_lock = threading.Lock()
+    
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        if self._shutdown.is_set():
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        future = Future()
+        thread = threading.Thread(
+            target=self._run,
+            args=(future, fn, args, kwargs),
+            name=f"{self._thread_name_prefix}_{next(self._thread_ids)}",
+            daemon=True
+        )
+        with self._threads_lock:
+            self._threads.add(thread)
+        thread.start()
+        return future
+    
+    def _run(self, future: Future, fn: Callable, args: tuple, kwargs: dict):
+        try:
+            with self._slots:
+                if self._shutdown.is_set():
+                    future.cancel()
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            with self._threads_lock:
+                self._threads.discard(threading.current_thread())
+    
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        """Stop accepting work; queued calls are always cancelled."""
+        self._shutdown.set()
+        if wait:
+            with self._threads_lock:
+                threads = list(self._threads)
+            for thread in threads:
+                thread.join()
+
+
 class EnhancedAgentOrchestrator:
     """Enhanced orchestrator with generic agent management."""
     
-    def __init__(self):
+    def __init__(self, response_cache: Optional[ResponseCache] = None):
         self.agents: Dict[int, BaseAgent] = {}
-        self.callbacks: List[Callable] = []
-        self.max_concurrent_agents = 5
+        self.callbacks: Tuple[Callable, ...] = ()
+        self.max_concurrent_agents = config.MAX_AGENT_WORKERS
+        self.response_cache = response_cache
+        
+        # Agent ids grouped by status, kept in sync from status updates
+        self._by_status: Dict[AgentStatus, Set[int]] = {status: set() for status in AgentStatus}
+        self._lock = threading.RLock()
+        
+        # At most max_concurrent_agents run at once; extra agents queue as
+        # PENDING. Daemon threads, so closing the app never waits on them.
+        self._executor = _DaemonThreadExecutor(
+            max_workers=self.max_concurrent_agents,
+            thread_name_prefix="agent"
+        )
+        
+        # Status updates are handed to one dispatcher thread so agent threads
+        # never block on printing or on slow UI callbacks
+        self._events: "queue.SimpleQueue[Optional[BaseAgent]]" = queue.SimpleQueue()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_events,
+            name="agent-events",
+            daemon=True
+        )
+        self._dispatcher.start()
     
     def add_callback(self, callback: Callable):
         """Add callback for agent updates."""
-        self.callbacks.append(callback)
+        with self._lock:
+            self.callbacks = self.callbacks + (callback,)
     
     def create_agent(
         self,
@@ -330,12 +788,7 @@ class EnhancedAgentOrchestrator:
         **kwargs
     ) -> GenericAgent:
         """Create and register a new generic agent."""
-        
-        # Check concurrent agents limit
-        running_agents = self.get_running_agents()
-        if len(running_agents) >= self.max_concurrent_agents:
-            raise Exception(f"Maximum concurrent agents ({self.max_concurrent_agents}) reached.")
-        
+        kwargs.setdefault('response_cache', self.response_cache)
         agent = GenericAgent(
             name=name,
             description=description,
@@ -344,33 +797,80 @@ class EnhancedAgentOrchestrator:
             **kwargs
         )
         
-        self.agents[agent.id] = agent
+        with self._lock:
+            self.agents[agent.id] = agent
+            self._by_status[agent.status].add(agent.id)
+        agent.add_transition_hook(self._on_status_transition)
         agent.add_callback(self._on_agent_update)
         
-        print(f"Created generic agent {agent.id}: {agent.name}")
+        logger.info("Created generic agent %s: %s", agent.id, agent.name)
         return agent
     
+    def execute_agent(self, agent: BaseAgent) -> Future:
+        """Run an agent on the shared worker pool."""
+        return agent.execute(self._executor)
+    
     def get_agent(self, agent_id: int) -> Optional[BaseAgent]:
         """Get agent by ID."""
         return self.agents.get(agent_id)
     
     def list_agents(self) -> List[BaseAgent]:
-        """Get list of all agents."""
-        return sorted(self.agents.values(), key=lambda x: x.id, reverse=True)
+        """Get list of all agents, newest first."""
+        # Agents are inserted in creation order, so no sort is needed
+        with self._lock:
+            return list(reversed(self.agents.values()))
+    
+    def get_agent_statistics(self) -> Dict[str, int]:
+        """Count agents per status straight from the status index."""
+        with self._lock:
+            stats = {"total": len(self.agents)}
+            for status, agent_ids in self._by_status.items():
+                stats[status.name.lower()] = len(agent_ids)
+            return stats
     
     def get_running_agents(self) -> List[BaseAgent]:
         """Get list of currently running agents."""
-        return [agent for agent in self.agents.values() if agent.status == AgentStatus.RUNNING]
+        return self._agents_with_status(AgentStatus.RUNNING)
+    
+    def _agents_with_status(self, status: AgentStatus) -> List[BaseAgent]:
+        """Get registered agents with the given status from the status index."""
+        with self._lock:
+            return [self.agents[agent_id] for agent_id in self._by_status[status] if agent_id in self.agents]
+    
+    def _on_status_transition(self, agent: BaseAgent, old_status: AgentStatus, new_status: AgentStatus):
+        """Move an agent between status index sets."""
+        with self._lock:
+            if agent.id not in self.agents:
+                return
+            self._by_status[old_status].discard(agent.id)
+            self._by_status[new_status].add(agent.id)
     
     def stop_all_agents(self):
         """Stop all running agents."""
         for agent in self.get_running_agents():
-            agent.set_status(AgentStatus.FAILED)
-            agent.error = "Stopped by orchestrator"
+            agent.set_status(AgentStatus.FAILED, expected=AgentStatus.RUNNING, error="Stopped by orchestrator")
+    
+    def shutdown(self):
+        """Stop running agents and drop the ones still queued for a worker."""
+        self.stop_all_agents()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._events.put(None)
     
     def _on_agent_update(self, agent: BaseAgent):
+        """Queue an agent status update for the dispatcher thread."""
+        self._events.put(agent)
+    
+    def _dispatch_events(self):
+        """Deliver queued status updates until shutdown() sends the sentinel."""
+        while True:
+            agent = self._events.get()
+            if agent is None:
+                break
+            self._handle_agent_update(agent)
+    
+    def _handle_agent_update(self, agent: BaseAgent):
         """Handle agent status updates."""
-        print(f"Agent {agent.id} ({agent.name}) status: {agent.status}")
+        logger.info("Agent %s (%s) status: %s", agent.id, agent.name, agent.status)
         
         # Cleanup if too many agents
         if len(self.agents) > 100:
@@ -381,23 +881,40 @@ class EnhancedAgentOrchestrator:
             try:
                 callback(agent)
             except Exception as e:
-                print(f"Error in orchestrator callback: {e}")
+                logger.error("Error in orchestrator callback: %s", e)
     
     def _cleanup_old_agents(self, max_agents: int):
-        """Clean up old agents."""
-        if len(self.agents) > max_agents:
-            sorted_agents = sorted(self.agents.items(), key=lambda x: x[1].id, reverse=True)
-            agents_to_keep = dict(sorted_agents[:max_agents])
-            removed_count = len(self.agents) - len(agents_to_keep)
-            self.agents = agents_to_keep
-            print(f"Cleaned up {removed_count} old agents")
+        """Evict the oldest finished agents until at most max_agents remain."""
+        with self._lock:
+            excess = len(self.agents) - max_agents
+            if excess <= 0:
+                return
+            
+            # self.agents is in creation order, so only the oldest entries are
+            # visited; pending and running agents are never evicted
+            to_remove = []
+            for agent_id, agent in self.agents.items():
+                if len(to_remove) >= excess:
+                    break
+                if agent.status >= AgentStatus.COMPLETED:
+                    to_remove.append(agent_id)
+            
+            for agent_id in to_remove:
+                del self.agents[agent_id]
+                for agent_ids in self._by_status.values():
+                    agent_ids.discard(agent_id)
+        
+        logger.info("Cleaned up %d old agents", len(to_remove))
 
 
 class EnhancedAgentRegistry:
     """Registry for generic agent creation."""
     
     def __init__(self):
-        self.orchestrator = EnhancedAgentOrchestrator()
+        # Identical first requests (same tools, instructions and model) are
+        # answered from here instead of another API round-trip
+        self.response_cache = ResponseCache()
+        self.orchestrator = EnhancedAgentOrchestrator(response_cache=self.response_cache)
     
     def create_agent(
         self,
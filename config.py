@@ -4,10 +4,11 @@ Configuration settings for the Moonshot-based EragAPI application.
 """
 
 import os
-from dotenv import load_dotenv
 
 # Load environment variables from .env file
-load_dotenv()
+if not os.environ.get("REDTEAM_SKIP_DOTENV"):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Model Configuration
 DEFAULT_MODEL = "moonshot-v1-32k-chat"
@@ -23,6 +24,18 @@ MAX_AGENT_ITERATIONS = 10
 AGENT_API_TIMEOUT = 60
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_MAX_TOKENS = 1500
+# Completion budget for each agent turn; agents write longer reports
+AGENT_MAX_TOKENS = 2000
+# Character budget for an agent's resent history; older tool results are
+# compacted and then evicted to stay under it
+AGENT_HISTORY_MAX_CHARS = 24000
+# Worker threads in the orchestrator's agent pool; extra agents queue as PENDING
+MAX_AGENT_WORKERS = int(os.environ.get("RTA_AGENT_WORKERS", "5"))
+# Root log level; DEBUG turns on the per-iteration agent traces. Unknown
+# names fall back to INFO rather than failing at startup.
+LOG_LEVEL = os.environ.get("RTA_LOG_LEVEL", "INFO").upper()
+if LOG_LEVEL not in ("CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"):
+    LOG_LEVEL = "INFO"
 
 # Tool Configuration
 TOOLS_DIRECTORY = "mcp"
@@ -5,7 +5,11 @@ import os
 import sys
 import subprocess
 import threading
+import logging
+import logging.handlers
+import queue
 import datetime
+import time
 import requests  # Added for direct API calls
 import json
 import re
@@ -13,6 +17,11 @@ import importlib.util
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -20,8 +29,26 @@ load_dotenv()
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import our improved agent system
+import config
 from agents import agent_registry, BaseAgent, AgentStatus
 from moonshot_client import MoonshotClient
+import result_writer
+
+# Used to turn agent names into file-name fragments
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w\s-]')
+_SEPARATOR_RE = re.compile(r'[-\s]+')
+
+
+def _write_json_file(filepath: str, data: Dict[str, Any]):
+    """Write data as indented JSON, using orjson when it is installed."""
+    # Recreate the directory in case it was removed while the app was running
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    if orjson is not None:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
 
 
 class ToolLoader:
@@ -202,6 +229,10 @@ class ImprovedChatInterface(ttk.Frame):
         agents_frame = ttk.Frame(self.notebook)
         self.notebook.add(agents_frame, text="Agents")
         
+        # Per-status counts, refreshed with the agent list
+        self.agent_summary = ttk.Label(agents_frame, text="No agents yet", anchor="w")
+        self.agent_summary.pack(side="top", fill="x", pady=(0, 5))
+        
         # Agent list
         columns = ("id", "name", "type", "status", "duration")
         self.agent_tree = ttk.Treeview(agents_frame, columns=columns, show="headings", height=10)
@@ -271,6 +302,13 @@ class ImprovedChatInterface(ttk.Frame):
         """Toggle tool enabled/disabled."""
         tool.enabled = not tool.enabled
         display_name = getattr(tool, 'friendly_name', tool_name)
+        
+        # Live agents resolve their enabled tools once; make them re-read it
+        for agent in self.orchestrator.list_agents():
+            if agent.status in (AgentStatus.PENDING, AgentStatus.RUNNING):
+                refresh = getattr(agent, 'refresh_active_tools', None)
+                if refresh is not None:
+                    refresh()
         btn = self.tool_buttons[tool_name]
         
         if tool.enabled:
@@ -461,25 +499,6 @@ class ImprovedChatInterface(ttk.Frame):
             self.send_button.config(state="normal", text="Send")
             self.status_label.config(text="Error", foreground="red")
     
-    def _extract_content(self, response_data: Dict) -> str:
-        """Extract content from API response."""
-        if "choices" in response_data and len(response_data["choices"]) > 0:
-            choice = response_data["choices"][0]
-            if "message" in choice and "content" in choice["message"]:
-                return choice["message"]["content"]
-        
-        if "message" in response_data:
-            if isinstance(response_data["message"], str):
-                return response_data["message"]
-            elif "content" in response_data["message"]:
-                return response_data["message"]["content"]
-        
-        for key in ["content", "response", "text"]:
-            if key in response_data:
-                return response_data[key]
-        
-        return str(response_data)
-    
     def _process_agent_creation(self, ai_response: str) -> bool:
         """Process agent creation requests with enhanced error handling."""
         agent_creator = self.tools.get('mcp_agent_creator')
@@ -554,15 +573,13 @@ class ImprovedChatInterface(ttk.Frame):
         
         # Wait for completion with timeout
         max_wait_time = 180  # 3 minutes max
+        status_interval = 30
         wait_time = 0
         
-        while agent.status in [AgentStatus.PENDING, AgentStatus.RUNNING] and wait_time < max_wait_time:
-            threading.Event().wait(1)  # Better than time.sleep
-            wait_time += 1
-            
-            # Update status every 30 seconds
-            if wait_time % 30 == 0:
-                self._print_message(f"[Agent '{agent.name}' still working... ({wait_time}s elapsed)]\n", "agent_update")
+        # Block on the agent's completion event, waking only for status updates
+        while wait_time < max_wait_time and not agent.wait(status_interval):
+            wait_time += status_interval
+            self._print_message(f"[Agent '{agent.name}' still working... ({wait_time}s elapsed)]\n", "agent_update")
         
         # Process results
         self._process_agent_results(agent)
@@ -600,14 +617,11 @@ class ImprovedChatInterface(ttk.Frame):
             self._print_message(f"[⚠ Agent '{agent.name}' timed out after 3 minutes]\n", "error")
     
     def _save_agent_results(self, agent: BaseAgent):
-        """Save agent results to file."""
+        """Queue agent results to be written to file by the background writer."""
         try:
-            # Ensure the results directory exists
-            os.makedirs(self.results_dir, exist_ok=True)
-            
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            safe_name = re.sub(r'[^\w\s-]', '', agent.name).strip()
-            safe_name = re.sub(r'[-\s]+', '-', safe_name)
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            safe_name = _UNSAFE_FILENAME_RE.sub('', agent.name).strip()
+            safe_name = _SEPARATOR_RE.sub('-', safe_name)
             filename = f"agent_{timestamp}_{agent.id}_{safe_name}.json"
             filepath = os.path.join(self.results_dir, filename)
             
@@ -617,7 +631,7 @@ class ImprovedChatInterface(ttk.Frame):
                     "id": agent.id,
                     "name": agent.name,
                     "description": agent.description,
-                    "status": agent.status,
+                    "status": agent.status.name,
                     "start_time": agent.start_time,
                     "end_time": agent.end_time,
                     "execution_time": agent.get_execution_time(),
@@ -627,19 +641,30 @@ class ImprovedChatInterface(ttk.Frame):
                     "task_type": getattr(agent, 'task_type', 'unknown'),
                     "task_params": getattr(agent, 'task_params', {})
                 },
-                "conversation_history": getattr(agent, 'conversation_history', []),
+                # Copied, since a timed-out agent may still be appending
+                "conversation_history": list(getattr(agent, 'conversation_history', [])),
                 "results": agent.result,
                 "timestamp": datetime.datetime.now().isoformat()
             }
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(agent_data, f, indent=2, ensure_ascii=False)
-            
-            self._print_message(f"[Agent results saved to: {filename}]\n", "system")
+            # Serialized and written by the shared result writer, so the
+            # orchestrator can carry on while large histories reach disk.
+            # The outcome is reported back on the Tk thread.
+            result_writer.submit(
+                _write_json_file, filepath, agent_data,
+                on_done=lambda error: self.after(0, self._on_agent_results_saved, filename, error)
+            )
             
         except Exception as e:
             self._print_message(f"[Error saving agent results: {e}]\n", "error")
     
+    def _on_agent_results_saved(self, filename: str, error: Optional[Exception]):
+        """Report the outcome of a queued agent results write."""
+        if error is not None:
+            self._print_message(f"[Error saving agent results: {error}]\n", "error")
+        else:
+            self._print_message(f"[Agent results saved to: {filename}]\n", "system")
+    
     def _continue_orchestrator_with_results(self, agent: BaseAgent):
         """Continue orchestrator conversation with agent results."""
         if agent.status == AgentStatus.COMPLETED and agent.result:
@@ -696,26 +721,46 @@ class ImprovedChatInterface(ttk.Frame):
             self._print_message(status_msg, "agent_update")
     
     def _update_agent_tree(self):
-        """Update the agent tree view."""
-        for item in self.agent_tree.get_children():
-            self.agent_tree.delete(item)
+        """Update the agent tree view in place, one row per agent id."""
+        stats = self.orchestrator.get_agent_statistics()
+        if stats["total"]:
+            self.agent_summary.config(text=(
+                f"Agents: {stats['total']} total, {stats['running']} running, "
+                f"{stats['pending']} queued, {stats['completed']} completed, {stats['failed']} failed"
+            ))
+        else:
+            self.agent_summary.config(text="No agents yet")
         
-        for agent in self.orchestrator.list_agents():
+        agents = self.orchestrator.list_agents()
+        # Rows are keyed by agent id, so only rows of removed agents are
+        # deleted and the current selection survives a refresh
+        current_ids = {str(agent.id) for agent in agents}
+        stale = [item for item in self.agent_tree.get_children() if item not in current_ids]
+        if stale:
+            self.agent_tree.delete(*stale)
+        
+        for index, agent in enumerate(agents):
             duration = ""
             if agent.get_execution_time():
                 duration = f"{agent.get_execution_time():.1f}s"
             elif agent.status == AgentStatus.RUNNING and agent.start_time:
-                import time
                 current_duration = time.time() - agent.start_time
                 duration = f"{current_duration:.1f}s"
             
-            self.agent_tree.insert("", "end", values=(
+            values = (
                 agent.id,
                 agent.name,
                 getattr(agent, 'task_type', 'Unknown'),
                 agent.status,
                 duration
-            ))
+            )
+            item = str(agent.id)
+            if self.agent_tree.exists(item):
+                self.agent_tree.item(item, values=values)
+            else:
+                # Agents are listed newest first, so existing rows keep
+                # their relative order and new ones slot in at their index
+                self.agent_tree.insert("", index, iid=item, values=values)
     
     def _on_agent_select(self, event):
         """Handle agent selection."""
@@ -784,8 +829,7 @@ class ImprovedChatInterface(ttk.Frame):
         running_agents = self.orchestrator.get_running_agents()
         if running_agents:
             for agent in running_agents:
-                agent.set_status(AgentStatus.FAILED)
-                agent.error = "Manually stopped by user"
+                agent.set_status(AgentStatus.FAILED, expected=AgentStatus.RUNNING, error="Manually stopped by user")
             self._print_message(f"[Stopped {len(running_agents)} running agents]\n", "system")
         else:
             self._print_message("[No running agents to stop]\n", "system")
@@ -818,7 +862,7 @@ class ImprovedChatInterface(ttk.Frame):
                             {
                                 "id": agent.id,
                                 "name": agent.name,
-                                "status": agent.status,
+                                "status": agent.status.name,
                                 "result": agent.result,
                                 "error": agent.error
                             }
@@ -827,8 +871,7 @@ class ImprovedChatInterface(ttk.Frame):
                         "timestamp": datetime.datetime.now().isoformat()
                     }
                     
-                    with open(filename, "w", encoding="utf-8") as f:
-                        json.dump(chat_data, f, indent=2, ensure_ascii=False)
+                    _write_json_file(filename, chat_data)
                 else:
                     # Save as text
                     with open(filename, "w", encoding="utf-8") as f:
@@ -982,8 +1025,9 @@ For more help, check the console output or log files."""
     
     def on_closing(self):
         """Handle application closing."""
-        # Stop all agents
+        # Stop all agents and release the agent worker pool
         self.chat_interface.stop_all_agents()
+        self.chat_interface.orchestrator.shutdown()
         
         # Save current state if there's conversation history
         if self.chat_interface.conversation_history:
@@ -993,6 +1037,22 @@ For more help, check the console output or log files."""
         self.quit()
 
 
+def _configure_logging() -> logging.handlers.QueueListener:
+    """Route log records through a queue so agent threads never wait on console I/O."""
+    log_queue = queue.SimpleQueue()
+    # stdout, where the print() diagnostics these records replace used to go
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=config.LOG_LEVEL, handlers=[logging.handlers.QueueHandler(log_queue)])
+    listener = logging.handlers.QueueListener(log_queue, console)
+    listener.start()
+    return listener
+
+
 if __name__ == "__main__":
-    app = MainApplication()
-    app.mainloop()
\ No newline at end of file
+    log_listener = _configure_logging()
+    try:
+        app = MainApplication()
+        app.mainloop()
+    finally:
+        log_listener.stop()
\ No newline at end of file
@@ -4,6 +4,7 @@ import sys
 import os
 import xml.etree.ElementTree as ET
 import re
+import logging
 from typing import Dict, Any, List, Optional
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -11,6 +12,14 @@ from mcp_base import MCPTool
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+logger = logging.getLogger(__name__)
+
+# Agent-request patterns, compiled once at import; fenced blocks win
+_AGENT_XML_PATTERNS = (
+    re.compile(r'```xml\s*(<agent>.*?</agent>)\s*```', re.DOTALL | re.IGNORECASE),
+    re.compile(r'(<agent>.*?</agent>)', re.DOTALL | re.IGNORECASE),
+)
+
 
 class McpAgentCreator(MCPTool):
     """Simplified agent creator for generic agents - only creates agents with instructions."""
@@ -24,20 +33,15 @@ class McpAgentCreator(MCPTool):
     def set_tools(self, tools: Dict[str, Any]):
         """Update the tools dictionary."""
         self.tools = tools or {}
-        print(f"DEBUG: Agent Creator tools updated: {list(self.tools.keys())}")
+        logger.debug("Agent Creator tools updated: %s", list(self.tools))
     
     def get_description(self) -> str:
         return "Create generic agents with specific task instructions from the orchestrator."
     
     def detect_request(self, text: str) -> Optional[Dict[str, Any]]:
         """Detect agent creation requests - now looks for any agent XML."""
-        patterns = [
-            r'```xml\s*(<agent>.*?</agent>)\s*```',
-            r'(<agent>.*?</agent>)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+        for pattern in _AGENT_XML_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return {"agent_xml": match.group(1)}
         
@@ -83,8 +87,9 @@ class McpAgentCreator(MCPTool):
             agent = self._create_generic_agent(name, description, instructions)
             
             if agent:
-                # Start agent execution
-                agent.execute()
+                # Start agent execution on the orchestrator's worker pool
+                from agents import agent_registry
+                agent_registry.get_orchestrator().execute_agent(agent)
                 return self._create_agent_summary(agent, instructions)
             else:
                 return "Error: Failed to create generic agent"
@@ -1,7 +1,13 @@
 # mcp_base.py - Simplified MCP base class
+import os
+import sys
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import result_writer
+
+
 class MCPTool(ABC):
     """Simplified base class for MCP tools."""
     
@@ -10,6 +16,7 @@ class MCPTool(ABC):
         self.enabled = False
         self.description = self.get_description()
         self.friendly_name = self.name  # Default friendly name
+        self.xml_name = self.name  # Name used in <tool><name>...</name> calls
     
     @abstractmethod
     def get_description(self) -> str:
@@ -33,4 +40,8 @@ class MCPTool(ABC):
         Return system prompt explaining how to use this tool.
         Override in subclasses for tool-specific instructions.
         """
-        return f"You have access to {self.friendly_name}: {self.description}"
\ No newline at end of file
+        return f"You have access to {self.friendly_name}: {self.description}"
+    
+    def _write_result_file(self, filepath: str, content: str):
+        """Queue a result file to be written by the background writer."""
+        result_writer.submit(result_writer.write_text, filepath, content)
\ No newline at end of file
@@ -6,12 +6,23 @@ import datetime
 from typing import Dict, Any, Optional
 from mcp_base import MCPTool
 
+# Request-detection patterns, compiled once at import
+_XML_RE = re.compile(r'<tool>\s*<n>curl</n>\s*<parameters>(.*?)</parameters>\s*</tool>', re.IGNORECASE | re.DOTALL)
+_TARGET_RE = re.compile(r'<target>(.*?)</target>', re.DOTALL)
+_COMMAND_ID_RE = re.compile(r'<command_id>(\d+)</command_id>')
+_RAW_COMMAND_RE = re.compile(r'<raw_command>(.*?)</raw_command>', re.DOTALL)
+_DATA_RE = re.compile(r'<data>(.*?)</data>', re.DOTALL)
+_AUTH_RE = re.compile(r'<auth>(.*?)</auth>', re.DOTALL)
+_DIRECT_CURL_RE = re.compile(r'curl\s+.*?(https?://[^\s]+)', re.IGNORECASE)
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w.-]')
+
 class McpCurl(MCPTool):
     """Simplified curl tool for HTTP requests and basic security testing."""
     
     def __init__(self):
         super().__init__()
         self.friendly_name = "Curl"
+        self.xml_name = "curl"
         self.default_timeout = 30
         
         # Create results directory
@@ -37,35 +48,34 @@ class McpCurl(MCPTool):
         """Detect curl command requests."""
         
         # Check for XML format
-        xml_match = re.search(r'<tool>\s*<n>curl</n>\s*<parameters>(.*?)</parameters>\s*</tool>', 
-                             text, re.IGNORECASE | re.DOTALL)
+        xml_match = _XML_RE.search(text)
         if xml_match:
             params_text = xml_match.group(1)
             params = {}
             
             # Extract common parameters
-            target_match = re.search(r'<target>(.*?)</target>', params_text, re.DOTALL)
+            target_match = _TARGET_RE.search(params_text)
             if target_match:
                 params["target"] = target_match.group(1).strip()
             
             # Check for command_id (predefined command)
-            cmd_id_match = re.search(r'<command_id>(\d+)</command_id>', params_text)
+            cmd_id_match = _COMMAND_ID_RE.search(params_text)
             if cmd_id_match:
                 params["command_id"] = int(cmd_id_match.group(1))
                 params["command_type"] = "predefined"
             else:
                 # Check for raw command
-                raw_match = re.search(r'<raw_command>(.*?)</raw_command>', params_text, re.DOTALL)
+                raw_match = _RAW_COMMAND_RE.search(params_text)
                 if raw_match:
                     params["raw_command"] = raw_match.group(1).strip()
                     params["command_type"] = "raw"
             
             # Optional parameters
-            data_match = re.search(r'<data>(.*?)</data>', params_text, re.DOTALL)
+            data_match = _DATA_RE.search(params_text)
             if data_match:
                 params["data"] = data_match.group(1).strip()
             
-            auth_match = re.search(r'<auth>(.*?)</auth>', params_text, re.DOTALL)
+            auth_match = _AUTH_RE.search(params_text)
             if auth_match:
                 params["auth"] = auth_match.group(1).strip()
             
@@ -73,7 +83,7 @@ class McpCurl(MCPTool):
                 return params
         
         # Check for direct curl commands
-        curl_match = re.search(r'curl\s+.*?(https?://[^\s]+)', text, re.IGNORECASE)
+        curl_match = _DIRECT_CURL_RE.search(text)
         if curl_match:
             return {
                 "target": curl_match.group(1),
@@ -188,17 +198,18 @@ class McpCurl(MCPTool):
         """Save curl results to file."""
         try:
             # Create safe filename
-            safe_target = re.sub(r'[^\w.-]', '_', target.replace('https://', '').replace('http://', ''))
+            safe_target = _UNSAFE_FILENAME_RE.sub('_', target.replace('https://', '').replace('http://', ''))
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"curl_{timestamp}_{safe_target[:30]}.txt"
             filepath = os.path.join(self.results_dir, filename)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"Curl Execution Results\n")
-                f.write(f"Target: {target}\n")
-                f.write(f"Timestamp: {datetime.datetime.now().isoformat()}\n")
-                f.write("=" * 50 + "\n\n")
-                f.write(result)
+            self._write_result_file(filepath, (
+                f"Curl Execution Results\n"
+                f"Target: {target}\n"
+                f"Timestamp: {datetime.datetime.now().isoformat()}\n"
+                + "=" * 50 + "\n\n"
+                + result
+            ))
             
         except Exception as e:
             print(f"Error saving curl results: {e}")
@@ -1,17 +1,53 @@
 # mcp_websearch.py - Simplified web search tool
 import requests
 import re
+import atexit
 import os
 import datetime
+import hashlib
+import shelve
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, Any, Optional
+from requests.adapters import HTTPAdapter
 from mcp_base import MCPTool
 
+
+def _create_session() -> requests.Session:
+    """Create a keep-alive session for repeated DuckDuckGo queries."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+# Request-detection and parsing patterns, compiled once at import
+_XML_RE = re.compile(r'<tool>\s*<name>web[_ ]search</name>\s*<parameters>\s*<query>(.*?)</query>\s*</parameters>\s*</tool>', re.IGNORECASE | re.DOTALL)
+_FENCED_XML_RE = re.compile(r'```xml.*?<tool>.*?<name>web[_ ]search</name>.*?<query>(.*?)</query>.*?</tool>.*?```', re.IGNORECASE | re.DOTALL)
+_TEXT_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'search\s+for\s+(.+?)(?:\n|$|\.|,)',
+    r'look\s+up\s+(.+?)(?:\n|$|\.|,)',
+    r'find\s+information\s+about\s+(.+?)(?:\n|$|\.|,)',
+    r'google\s+(.+?)(?:\n|$|\.|,)',
+))
+_RESULT_LINK_RE = re.compile(r'<a[^>]+class="result__a"[^>]+href="([^"]+)"[^>]*>([^<]+)</a>')
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w\s-]')
+_SEPARATOR_RE = re.compile(r'[-\s]+')
+
+
+# Every search hits the same host, so reuse the TCP/TLS connection across agents
+_SESSION = _create_session()
+
 class McpWebsearch(MCPTool):
     """Simplified web search tool using DuckDuckGo."""
     
     def __init__(self):
         super().__init__()
         self.friendly_name = "Web Search"
+        self.xml_name = "web_search"
         self.max_results = 5
         self.snippet_length = 2000  # Reasonable length for LLM
         
@@ -19,6 +55,25 @@ class McpWebsearch(MCPTool):
         self.results_dir = os.path.join("results", "websearch")
         os.makedirs(self.results_dir, exist_ok=True)
         
+        # Persistent cache of parsed results, shared across agents and restarts
+        self.cache_ttl = 6 * 3600
+        self.cache_max_entries = 500
+        self._cache_lock = threading.Lock()
+        cache_dir = os.path.join(self.results_dir, "cache")
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            self._cache = shelve.open(os.path.join(cache_dir, "search_cache"))
+        except Exception as e:
+            print(f"Search cache unavailable, using memory only: {e}")
+            self._cache = {}
+        # Key -> store time, oldest first, so eviction never reads cached values.
+        # Built once here; the shelf itself is only read on lookups.
+        self._cache_index: "OrderedDict[str, float]" = OrderedDict(
+            sorted(((key, entry[0]) for key, entry in self._cache.items()), key=lambda item: item[1])
+        )
+        # Some dbm backends only write their index on close
+        atexit.register(self._close_cache)
+        
         # User agent for requests
         self.user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     
@@ -29,27 +84,18 @@ class McpWebsearch(MCPTool):
         """Detect web search requests in various formats."""
         
         # Check for XML format first
-        xml_match = re.search(r'<tool>\s*<name>web[_ ]search</name>\s*<parameters>\s*<query>(.*?)</query>\s*</parameters>\s*</tool>', 
-                             text, re.IGNORECASE | re.DOTALL)
+        xml_match = _XML_RE.search(text)
         if xml_match:
             return {"query": xml_match.group(1).strip()}
         
         # Check for simple XML format
-        simple_xml = re.search(r'```xml.*?<tool>.*?<name>web[_ ]search</name>.*?<query>(.*?)</query>.*?</tool>.*?```', 
-                              text, re.IGNORECASE | re.DOTALL)
+        simple_xml = _FENCED_XML_RE.search(text)
         if simple_xml:
             return {"query": simple_xml.group(1).strip()}
         
         # Check for text patterns
-        patterns = [
-            r'search\s+for\s+(.+?)(?:\n|$|\.|,)',
-            r'look\s+up\s+(.+?)(?:\n|$|\.|,)',
-            r'find\s+information\s+about\s+(.+?)(?:\n|$|\.|,)',
-            r'google\s+(.+?)(?:\n|$|\.|,)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in _TEXT_PATTERNS:
+            match = pattern.search(text)
             if match:
                 query = match.group(1).strip()
                 if len(query) > 2:  # Avoid very short queries
@@ -64,7 +110,7 @@ class McpWebsearch(MCPTool):
             return "Error: Search query is required"
         
         try:
-            results = self._search_duckduckgo(query)
+            results = self._cached_search(query)
             if not results:
                 return f"No search results found for: {query}"
             
@@ -79,13 +125,50 @@ class McpWebsearch(MCPTool):
         except Exception as e:
             return f"Search error: {str(e)}"
     
+    def _cached_search(self, query: str) -> list:
+        """Return cached results for a query, searching only on a miss or expiry."""
+        key = hashlib.blake2b(" ".join(query.lower().split()).encode("utf-8"), digest_size=16).hexdigest()
+        now = time.time()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry is not None and now - entry[0] < self.cache_ttl:
+            return entry[1]
+        
+        results = self._search_duckduckgo(query)
+        if results:
+            with self._cache_lock:
+                self._cache[key] = (now, results)
+                self._cache_index[key] = now
+                self._cache_index.move_to_end(key)
+                if len(self._cache_index) > self.cache_max_entries:
+                    self._evict_oldest()
+        return results
+    
+    def _evict_oldest(self):
+        """Drop the oldest tenth of the cache; the caller holds _cache_lock."""
+        for _ in range(min(len(self._cache_index), max(1, self.cache_max_entries // 10))):
+            key, _stored = self._cache_index.popitem(last=False)
+            self._cache.pop(key, None)
+    
+    def _close_cache(self):
+        """Flush and close the persistent cache, leaving an empty memory cache."""
+        with self._cache_lock:
+            cache, self._cache = self._cache, {}
+            self._cache_index.clear()
+            close = getattr(cache, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    print(f"Error closing search cache: {e}")
+    
     def _search_duckduckgo(self, query: str) -> list:
         """Search using DuckDuckGo HTML interface."""
         try:
             headers = {'User-Agent': self.user_agent}
             url = "https://html.duckduckgo.com/html/"
             
-            response = requests.post(url, data={'q': query}, headers=headers, timeout=10)
+            response = _SESSION.post(url, data={'q': query}, headers=headers, timeout=10)
             response.raise_for_status()
             
             # Parse results using BeautifulSoup if available, otherwise regex
@@ -102,14 +185,15 @@ class McpWebsearch(MCPTool):
     
     def _parse_with_bs4(self, soup):
         """Parse DuckDuckGo results using BeautifulSoup."""
-        results = []
+        # Keyed by URL so a page listed twice only uses up one result slot
+        results = {}
         
         # Find result links
         for link in soup.select("a.result__a"):
             title = link.get_text().strip()
             url = link.get('href', '')
             
-            if not url.startswith('http'):
+            if not url.startswith('http') or url in results:
                 continue
                 
             # Find snippet
@@ -120,34 +204,32 @@ class McpWebsearch(MCPTool):
                 if snippet_elem:
                     snippet = snippet_elem.get_text().strip()
             
-            results.append({
+            results[url] = {
                 'title': title,
                 'url': url,
                 'snippet': snippet
-            })
+            }
             
             if len(results) >= self.max_results:
                 break
         
-        return results
+        return list(results.values())
     
     def _parse_with_regex(self, html_content):
         """Fallback regex parsing for DuckDuckGo results."""
-        results = []
+        results = {}
         
-        # Regex patterns for DuckDuckGo results
-        link_pattern = r'<a[^>]+class="result__a"[^>]+href="([^"]+)"[^>]*>([^<]+)</a>'
-        matches = re.findall(link_pattern, html_content)
-        
-        for url, title in matches[:self.max_results]:
+        for url, title in _RESULT_LINK_RE.findall(html_content):
             if url.startswith('http'):
-                results.append({
+                results.setdefault(url, {
                     'title': title.strip(),
                     'url': url,
                     'snippet': ""  # Regex parsing doesn't easily get snippets
                 })
+                if len(results) >= self.max_results:
+                    break
         
-        return results
+        return list(results.values())
     
     def _format_results(self, query: str, results: list) -> str:
         """Format search results for display."""
@@ -176,18 +258,19 @@ class McpWebsearch(MCPTool):
         """Save search results to file."""
         try:
             # Create safe filename
-            safe_query = re.sub(r'[^\w\s-]', '', query).strip()
-            safe_query = re.sub(r'[-\s]+', '-', safe_query)
+            safe_query = _UNSAFE_FILENAME_RE.sub('', query).strip()
+            safe_query = _SEPARATOR_RE.sub('-', safe_query)
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"websearch_{timestamp}_{safe_query[:30]}.txt"
             filepath = os.path.join(self.results_dir, filename)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"Web Search Results\n")
-                f.write(f"Query: {query}\n")
-                f.write(f"Timestamp: {datetime.datetime.now().isoformat()}\n")
-                f.write("=" * 50 + "\n\n")
-                f.write(results)
+            self._write_result_file(filepath, (
+                f"Web Search Results\n"
+                f"Query: {query}\n"
+                f"Timestamp: {datetime.datetime.now().isoformat()}\n"
+                + "=" * 50 + "\n\n"
+                + results
+            ))
             
         except Exception as e:
             print(f"Error saving search results: {e}")
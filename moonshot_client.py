@@ -1,12 +1,148 @@
 # moonshot_client.py - Fixed version with proper model listing
 import os
+import random
+import threading
+import time
 import requests
 import json
-from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
+from typing import List, Dict, Any, Optional, Iterator
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Load environment variables from .env file
-load_dotenv()
+if not os.environ.get("REDTEAM_SKIP_DOTENV"):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize a request body, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    """Parse a response body, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _create_session() -> requests.Session:
+    """Create a keep-alive session shared by every client in the process."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=64,
+        # Only failures before the request is sent, or a 502/503/504 answer,
+        # are retried. A read timeout on a POST may already have billed a
+        # generation, so it is never re-sent.
+        max_retries=Retry(
+            total=2,
+            connect=2,
+            read=0,
+            backoff_factor=0.2,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False
+        )
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Agents and the orchestrator all call the same host, so reuse the TCP/TLS connections
+_SESSION = _create_session()
+
+# How many times a 429 response is retried before the error is raised
+RATE_LIMIT_RETRIES = 3
+
+
+class TokenBucket:
+    """
+    Adaptive client-side rate limiter.
+    
+    The refill rate creeps up after every successful call and is halved on a
+    429, so callers run at whatever pace the server currently allows instead
+    of sleeping a fixed interval between requests.
+    """
+    
+    def __init__(self, rate: float = 2.0, capacity: float = 4.0,
+                 min_rate: float = 0.2, max_rate: float = 10.0, increase: float = 0.1):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+    
+    def acquire(self):
+        """Take one token, sleeping until it is available."""
+        with self._lock:
+            self._refill()
+            # Reserve the token even when it has to be waited for, so
+            # concurrent callers queue up behind each other
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+    
+    def on_success(self):
+        """Additively raise the rate after a successful call."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+    
+    def on_throttle(self, retry_after: Optional[float], attempt: int):
+        """
+        Halve the rate after a 429 and push the bucket into debt.
+        
+        The next acquire() then waits out Retry-After, or a jittered
+        exponential backoff when the server did not send one.
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after is None:
+                retry_after = (2 ** attempt) * (0.5 + random.random())
+            self._refill()
+            self.tokens = min(0.0, self.tokens) - retry_after * self.rate
+
+
+# One bucket per API host, shared by every client (and so every agent) using it
+_BUCKETS: Dict[str, TokenBucket] = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def _bucket_for(url: str) -> TokenBucket:
+    """Return the shared rate-limit bucket for the host serving url."""
+    host = urlparse(url).netloc
+    with _BUCKETS_LOCK:
+        bucket = _BUCKETS.get(host)
+        if bucket is None:
+            bucket = _BUCKETS[host] = TokenBucket()
+        return bucket
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Return the Retry-After delay in seconds, if the server sent one."""
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
 
 class MoonshotClient:
     def __init__(self, api_key=None, model="moonshot-v1-32k"):
@@ -16,13 +152,12 @@ class MoonshotClient:
             raise ValueError("MOONSHOT_API_KEY environment variable is required but not set")
         self.model = model
         self.base_url = "https://api.moonshot.ai/v1"
+        self._bucket = _bucket_for(self.base_url)
+        # Request headers never change for a client, so build them once
+        self._auth_headers = {"Authorization": f"Bearer {self.api_key}"}
+        self._json_headers = {**self._auth_headers, "Content-Type": "application/json"}
     
     def chat(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: Optional[int] = None, stream: bool = False):
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": self.model,
             "messages": messages,
@@ -34,37 +169,76 @@ class MoonshotClient:
             payload["max_tokens"] = max_tokens
         
         try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                stream=stream,
-                timeout=60
-            )
+            body = _dumps(payload)
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                self._bucket.acquire()
+                response = _SESSION.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self._json_headers,
+                    data=body,
+                    stream=stream,
+                    timeout=60
+                )
+                if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                    break
+                
+                # Rate limited: slow down, the next acquire() waits before retrying
+                self._bucket.on_throttle(_retry_after(response), attempt)
+                response.close()
             
             if response.status_code != 200:
-                error_data = response.json()
+                error_data = _loads(response.content)
                 error_message = error_data.get("error", {}).get("message", "Unknown error")
                 raise Exception(f"Moonshot API error: {response.status_code} - {error_message}")
             
+            self._bucket.on_success()
             if stream:
                 return response
             else:
-                data = response.json()
+                data = _loads(response.content)
                 return data["choices"][0]["message"]["content"]
         except requests.exceptions.RequestException as e:
             raise Exception(f"Request error: {str(e)}")
         except json.JSONDecodeError as e:
             raise Exception(f"JSON decode error: {str(e)}")
     
+    def stream_chat(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: Optional[int] = None) -> Iterator[str]:
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+        
+        Closing the generator early closes the HTTP response, which also stops
+        the server from generating the rest of the reply.
+        """
+        response = self.chat(messages, temperature=temperature, max_tokens=max_tokens, stream=True)
+        try:
+            for line in response.iter_lines(chunk_size=8192):
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[6:].strip()
+                if data == b"[DONE]":
+                    break
+                try:
+                    chunk = _loads(data)
+                except ValueError:
+                    continue
+                
+                choices = chunk.get("choices") or []
+                if choices:
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Request error: {str(e)}")
+        finally:
+            response.close()
+    
     def list_models(self) -> List[str]:
         """Return the live Moonshot model catalogue."""
-        headers = {"Authorization": f"Bearer {self.api_key}"}
         try:
-            resp = requests.get(f"{self.base_url}/models", headers=headers, timeout=10)
+            resp = _SESSION.get(f"{self.base_url}/models", headers=self._auth_headers, timeout=10)
             resp.raise_for_status()
-            return [m["id"] for m in resp.json()["data"]]
-        except Exception as e:
+            return [m["id"] for m in _loads(resp.content)["data"]]
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
             print(f"[Moonshot] /models failed ({e}) — using fallback")
             # Last-resort fallback (the 12-model set you just confirmed)
             return [
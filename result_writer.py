@@ -0,0 +1,65 @@
+# result_writer.py - Background writer for result files
+"""
+One background thread writes every result file, for the MCP tools and the
+UI alike, so callers return without waiting on disk I/O.
+"""
+
+import atexit
+import os
+import queue
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+# (write, args, on_done) jobs; None stops the writer
+_WRITE_QUEUE: "queue.SimpleQueue[Optional[Tuple[Callable[..., None], Tuple[Any, ...], Any]]]" = queue.SimpleQueue()
+
+
+def write_text(filepath: str, content: str):
+    """Write a text file, recreating its directory if it has been removed."""
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def submit(write: Callable[..., None], *args: Any,
+           on_done: Optional[Callable[[Optional[Exception]], None]] = None):
+    """
+    Queue write(*args) for the writer thread.
+
+    on_done(error) is called on the writer thread afterwards, with None on
+    success; callers that touch widgets must hand it back to their UI thread.
+    Without on_done, failures are printed.
+    """
+    _WRITE_QUEUE.put((write, args, on_done))
+
+
+def _writer_loop():
+    while True:
+        item = _WRITE_QUEUE.get()
+        if item is None:
+            break
+        write, args, on_done = item
+        error = None
+        try:
+            write(*args)
+        except Exception as e:
+            error = e
+
+        if on_done is not None:
+            try:
+                on_done(error)
+            except Exception as e:
+                print(f"Error reporting saved results: {e}")
+        elif error is not None:
+            print(f"Error saving results to {args[0] if args else '?'}: {error}")
+
+
+_WRITER = threading.Thread(target=_writer_loop, name="result-writer", daemon=True)
+_WRITER.start()
+
+
+@atexit.register
+def _flush_result_files():
+    """Let queued result files reach disk before the interpreter exits."""
+    _WRITE_QUEUE.put(None)
+    _WRITER.join(timeout=5)